@@ -2,11 +2,13 @@ import mammoth
 import os
 import subprocess
 from datetime import datetime
+from output_paths import OUTPUT_DIR, OUTPUT_DIR_ENV
+from subset_fonts import FONTS_CSS, FONTS_DIRNAME, FONTS_LOCK, build_webfonts, fonts_pinned
 
 # === CONFIG ===
 REPO_PATH = os.path.dirname(os.path.abspath(__file__))
 INPUT_DOCX = os.path.join(REPO_PATH, "songs_reformatted.docx")
-OUTPUT_HTML = os.path.join(REPO_PATH, "song_notations.html")
+OUTPUT_HTML = os.path.join(OUTPUT_DIR, "song_notations.html")
 
 # INPUT_DOCX = "P:\\ShareDownloads\\songnotes\\songs_reformatted.docx"
 # OUTPUT_HTML = "P:\\ShareDownloads\\songnotes\\song_notations.html"
@@ -20,6 +22,15 @@ def convert_docx_to_html(input_path, output_path):
     with open(input_path, "rb") as docx_file:
         result = mammoth.convert_to_html(docx_file)
         html = result.value
+    # subset webfonts to the glyphs this page uses, once the sources are pinned;
+    # after that a font failure fails the conversion rather than degrading
+    if fonts_pinned():
+        fonts_dir = os.path.join(os.path.dirname(output_path), FONTS_DIRNAME)
+        build_webfonts(html, fonts_dir)
+        html = f'<link rel="stylesheet" href="{FONTS_DIRNAME}/{FONTS_CSS}">\n' + html
+    else:
+        print(f"[⚠️] {FONTS_LOCK.name} not found - using system fonts. "
+              "Pin them with: python subset_fonts.py --lock <commit>")
     # add no-copy script
     protect_js = """
     <style>
@@ -84,6 +95,10 @@ def convert_docx_to_html(input_path, output_path):
 def git_commit_and_push(repo_path, message):
     """Commit and push changes to GitHub"""
     subprocess.run(["git", "-C", repo_path, "add", "."], check=True)
+    # output/ is git-ignored, so a conversion alone may leave nothing to commit
+    if subprocess.run(["git", "-C", repo_path, "diff", "--cached", "--quiet"]).returncode == 0:
+        print("[INFO] Nothing to commit.")
+        return
     subprocess.run(["git", "-C", repo_path, "commit", "-m", message], check=True)
     subprocess.run(["git", "-C", repo_path, "push"], check=True)
     print("[OK] Changes pushed to GitHub.")
@@ -91,8 +106,11 @@ def git_commit_and_push(repo_path, message):
 if __name__ == "__main__":
     convert_docx_to_html(INPUT_DOCX, OUTPUT_HTML)
     
-    # Skip git operations in CI environment
-    if not os.getenv('GITHUB_ACTIONS'):
-        git_commit_and_push(REPO_PATH, COMMIT_MESSAGE)
-    else:
+    # Skip git operations in CI and in pipeline builds, whose output is
+    # staged outside the repo and published by deploy_site.py instead
+    if os.getenv('GITHUB_ACTIONS'):
         print("[INFO] Running in GitHub Actions - skipping git operations")
+    elif os.getenv(OUTPUT_DIR_ENV):
+        print("[INFO] Building into a staging dir - skipping git operations")
+    else:
+        git_commit_and_push(REPO_PATH, COMMIT_MESSAGE)
@@ -0,0 +1,257 @@
+"""
+Site build staging and delta deploy
+Each pipeline run writes its outputs into a fresh staging directory. Once the
+build completes a manifest of paths, sizes and content hashes is written and
+the staging directory is swapped in as the published site in one rename.
+Deploying compares that manifest with the one on the gh-pages branch and
+commits only the files whose hashes changed.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Configuration
+REPO_PATH = Path(__file__).resolve().parent
+BUILD_ROOT = REPO_PATH / "build"
+BUILDS_DIR = BUILD_ROOT / "builds"
+SITE_LINK = BUILD_ROOT / "site"  # symlink to the last completed build
+DEPLOY_REPO = BUILD_ROOT / "deploy.git"
+DEPLOY_BRANCH = "gh-pages"
+MANIFEST_NAME = "manifest.json"
+KEEP_FILES = ["CNAME"]  # set up on the branch by hand, kept when it is replaced
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def new_staging_dir(builds_dir=BUILDS_DIR):
+    """Create an empty directory for one build"""
+    builds_dir.mkdir(parents=True, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    staging_dir = builds_dir / name
+    staging_dir.mkdir()
+    return staging_dir
+
+
+def discard_build(staging_dir):
+    """Remove an incomplete build"""
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(site_dir):
+    """Map each file under site_dir (as a POSIX path) to its size and hash"""
+    site_dir = Path(site_dir)
+    files = {}
+    for path in sorted(site_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        rel = path.relative_to(site_dir).as_posix()
+        if rel == MANIFEST_NAME:
+            continue
+        files[rel] = {"size": path.stat().st_size, "sha256": file_sha256(path)}
+    return {"files": files}
+
+
+def write_manifest(site_dir):
+    """Write manifest.json into site_dir and return it"""
+    manifest = build_manifest(site_dir)
+    with open(Path(site_dir) / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return manifest
+
+
+def read_manifest(site_dir):
+    """Load manifest.json from site_dir"""
+    with open(Path(site_dir) / MANIFEST_NAME, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def swap_in(staging_dir, site_link=SITE_LINK):
+    """Make staging_dir the published site.
+
+    The site is a symlink, so replacing it is a single atomic rename and
+    readers see either the old build or the new one, never a mix. Where
+    symlinks are not permitted (e.g. Windows without developer mode) the
+    site is a real directory swapped with two renames instead.
+    """
+    staging_dir = Path(staging_dir)
+    previous = site_link.resolve() if site_link.is_symlink() else None
+    tmp_link = site_link.with_name(site_link.name + ".tmp")
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+
+    try:
+        os.symlink(os.path.relpath(staging_dir, site_link.parent), tmp_link,
+                   target_is_directory=True)
+        os.replace(tmp_link, site_link)
+    except OSError:
+        old_site = site_link.with_name(site_link.name + ".old")
+        if site_link.exists():
+            os.replace(site_link, old_site)
+        os.replace(staging_dir, site_link)
+        shutil.rmtree(old_site, ignore_errors=True)
+        return
+
+    if previous and previous != staging_dir.resolve():
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def publish_build(staging_dir, site_link=SITE_LINK):
+    """Write the manifest for a completed build and swap it in"""
+    # Serve files as-is; without this GitHub Pages runs Jekyll over the site
+    (Path(staging_dir) / ".nojekyll").touch()
+    manifest = write_manifest(staging_dir)
+    swap_in(staging_dir, site_link)
+    total = sum(entry["size"] for entry in manifest["files"].values())
+    print(f"[OK] Published build {Path(staging_dir).name}: {len(manifest['files'])} files, {total} bytes")
+    return manifest
+
+
+def diff_manifests(old_files, new_files):
+    """Return (changed, removed) paths between two manifest file maps"""
+    changed = [
+        path for path, entry in new_files.items()
+        if old_files.get(path, {}).get("sha256") != entry["sha256"]
+    ]
+    removed = [path for path in old_files if path not in new_files]
+    return changed, removed
+
+
+def git(repo, *args, input=None, env=None):
+    """Run a git command in repo and return its stripped stdout"""
+    result = subprocess.run(
+        ["git", "-C", str(repo), *args],
+        check=True, capture_output=True, text=True, input=input, env=env
+    )
+    return result.stdout.strip()
+
+
+def fetch_published(remote, branch=DEPLOY_BRANCH, repo_dir=DEPLOY_REPO):
+    """Fetch the tip of the deploy branch without its file contents.
+
+    Uses a shallow, blob-less fetch so only commits and trees are
+    downloaded; blobs are fetched lazily if something reads them.
+    Returns the tip commit, or None if the branch does not exist yet.
+    """
+    if not (repo_dir / "HEAD").exists():
+        repo_dir.mkdir(parents=True, exist_ok=True)
+        git(repo_dir, "init", "-q", "--bare")
+        git(repo_dir, "remote", "add", "origin", remote)
+        git(repo_dir, "config", "remote.origin.promisor", "true")
+        git(repo_dir, "config", "remote.origin.partialclonefilter", "blob:none")
+    else:
+        git(repo_dir, "remote", "set-url", "origin", remote)
+
+    if not git(repo_dir, "ls-remote", "--heads", "origin", branch):
+        return None
+
+    ref = f"refs/remotes/origin/{branch}"
+    git(repo_dir, "fetch", "-q", "--depth", "1", "--filter=blob:none",
+        "origin", f"+refs/heads/{branch}:{ref}")
+    return git(repo_dir, "rev-parse", ref)
+
+
+def published_files(parent, repo_dir=DEPLOY_REPO):
+    """File map from the manifest on the deploy branch.
+
+    Returns None if the branch has no manifest, i.e. it was not published
+    by this script and its contents are unknown.
+    """
+    try:
+        content = git(repo_dir, "show", f"{parent}:{MANIFEST_NAME}")
+    except subprocess.CalledProcessError:
+        return None
+    return json.loads(content).get("files", {})
+
+
+def deploy(site_dir, remote, branch=DEPLOY_BRANCH, repo_dir=DEPLOY_REPO):
+    """Commit the files that changed since the last deploy and push them.
+
+    The new tree is built from the published one in a private index, so
+    only changed files are read, hashed into git and pushed. If the branch
+    has no manifest (e.g. the old whole-repo publish) it is replaced in
+    full once, so nothing outside the site stays published; a CNAME on the
+    branch is kept.
+    """
+    site_dir = Path(site_dir).resolve()
+    new_files = read_manifest(site_dir)["files"]
+
+    parent = fetch_published(remote, branch, repo_dir)
+    old_files = published_files(parent, repo_dir) if parent else None
+    changed, removed = diff_manifests(old_files or {}, new_files)
+    if old_files is not None and not changed and not removed:
+        print("[INFO] No changes since last deploy - nothing to push")
+        return True
+
+    env = dict(os.environ, GIT_INDEX_FILE=str(repo_dir.resolve() / "deploy-index"))
+    if old_files is not None:
+        git(repo_dir, "read-tree", parent, env=env)
+    else:
+        if parent:
+            print(f"[INFO] {branch} has no {MANIFEST_NAME} - replacing its contents in full")
+        git(repo_dir, "read-tree", "--empty", env=env)
+
+    # Carried over from the parent tree by hash, so their blobs are never fetched
+    kept = git(repo_dir, "ls-tree", parent, "--", *KEEP_FILES) if parent and old_files is None else ""
+    index_info = "".join(f"{line}\n" for line in kept.splitlines())
+
+    paths = changed + [MANIFEST_NAME]
+    shas = git(repo_dir, "hash-object", "-w", "--stdin-paths",
+               input="\n".join(str(site_dir / path) for path in paths) + "\n",
+               env=env).splitlines()
+    index_info += "".join(f"100644 {sha}\t{path}\n" for sha, path in zip(shas, paths))
+    # Mode 0 removes an entry; --force-remove would need a work tree
+    null_sha = "0" * len(shas[0])
+    index_info += "".join(f"0 {null_sha}\t{path}\n" for path in removed)
+    git(repo_dir, "update-index", "--add", "--index-info", input=index_info, env=env)
+
+    tree = git(repo_dir, "write-tree", env=env)
+    message = f"Deploy {len(changed)} changed, {len(removed)} removed [{datetime.now()}]"
+    parent_args = ["-p", parent] if parent else []
+    commit = git(repo_dir, "commit-tree", tree, *parent_args, "-m", message, env=env)
+    git(repo_dir, "push", "-q", "origin", f"{commit}:refs/heads/{branch}")
+
+    sent = sum(new_files[path]["size"] for path in changed)
+    print(f"[OK] Deployed {len(changed)} changed and {len(removed)} removed files ({sent} bytes) to {branch}")
+    return True
+
+
+def main():
+    """Deploy the published site to the remote branch"""
+    parser = argparse.ArgumentParser(description="Deploy changed site files to gh-pages")
+    parser.add_argument("--remote", required=True, help="git remote URL or path")
+    parser.add_argument("--branch", default=DEPLOY_BRANCH,
+                        help=f"branch to deploy to (default: {DEPLOY_BRANCH})")
+    parser.add_argument("--site", type=Path, default=SITE_LINK,
+                        help=f"site directory (default: {SITE_LINK})")
+    args = parser.parse_args()
+
+    if not (args.site / MANIFEST_NAME).exists():
+        print(f"[ERROR] No published build found at {args.site}")
+        print("[INFO] Run the pipeline first: python run_pipeline.py")
+        return False
+
+    try:
+        return deploy(args.site, args.remote, args.branch)
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] Deploy failed: {e}\n{e.stderr}")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,423 @@
+"""
+Print-ready PDF export
+Splits the song notations HTML at the separator lines, prints each song in
+parallel across a pool of Playwright pages and merges the pieces into one PDF
+with a bookmark per song taken from the Table of Contents.
+"""
+
+import argparse
+import asyncio
+import codecs
+import gc
+import html
+import re
+import sys
+import tempfile
+from pathlib import Path
+from playwright.async_api import async_playwright
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    ByteStringObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+)
+
+from output_paths import OUTPUT_DIR
+from subset_fonts import FONT_FAMILY, FONTS_DIRNAME, embedded_font_css
+
+# File paths
+HTML_FILE = OUTPUT_DIR / "song_notations.html"
+PDF_FILE = OUTPUT_DIR / "song_notations.pdf"
+
+# Number of browser pages printing at the same time
+PAGE_POOL_SIZE = 4
+
+# Separator paragraph as mammoth writes it, e.g. <p><strong>=====****=====</strong></p>
+SEPARATOR_RE = re.compile(r"<p>(?:<[^>]+>)*\s*=+\*+=+\s*(?:<[^>]+>)*</p>")
+SONG_ID_RE = re.compile(r'<a id="song_(\d+)"></a>')
+TOC_LINK_RE = re.compile(r'<a href="#song_(\d+)">(.*?)</a>', re.S)
+# Protection and tracking blocks appended by convert_and_push.py
+SCRIPT_RE = re.compile(r"<(script|style)\b.*?</\1>", re.S)
+TAG_RE = re.compile(r"<[^>]+>")
+ANCHOR_RE = re.compile(r'<a id="([^"]+)"></a>')
+INTERNAL_HREF_RE = re.compile(r'<a href="#([^"]*)">')
+
+# In-document links are printed as absolute URLs under this base, which
+# Chromium always keeps as link annotations; the merge turns them back into
+# destinations inside the PDF
+INTERNAL_LINK_BASE = "https://songnotes.invalid/"
+
+PRINT_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>
+{fonts}
+@page {{ size: A4; margin: 15mm; }}
+body {{ font-family: "{family}", Georgia, serif; font-size: 11pt; }}
+p {{ margin: 0 0 4pt 0; }}
+a {{ color: inherit; text-decoration: none; }}
+</style>
+</head>
+<body>{body}</body>
+</html>"""
+
+
+def split_songs(content):
+    """Split the HTML into front matter and one (number, html) piece per song.
+
+    Each piece runs up to and including the separator line that follows it,
+    so a new piece starts exactly where reformat.add_page_break put the page
+    break in the Word document.
+    """
+    content = SCRIPT_RE.sub("", content)
+
+    pieces = []
+    start = 0
+    for match in SEPARATOR_RE.finditer(content):
+        pieces.append(content[start:match.end()])
+        start = match.end()
+    pieces.append(content[start:])
+
+    front_matter = pieces[0]
+    songs = []
+    for piece in pieces[1:]:
+        song_id = SONG_ID_RE.search(piece)
+        if song_id:
+            songs.append((int(song_id.group(1)), piece))
+        elif songs:
+            # Trailing separator or stray content - keep it with the previous song
+            number, previous = songs[-1]
+            songs[-1] = (number, previous + piece)
+        else:
+            front_matter += piece
+
+    return front_matter, songs
+
+
+def toc_titles(front_matter):
+    """Map song number to its Table of Contents entry as plain text"""
+    titles = {}
+    for number, label in TOC_LINK_RE.findall(front_matter):
+        titles[int(number)] = html.unescape(TAG_RE.sub("", label)).strip()
+    return titles
+
+
+def select_chunks(content, first=None, last=None):
+    """Build the list of (bookmark title, html) chunks to print.
+
+    Without a range the whole document is exported, Table of Contents first.
+    With a range only the matching songs are kept and the rest is skipped.
+    """
+    front_matter, songs = split_songs(content)
+    titles = toc_titles(front_matter)
+
+    chunks = []
+    if first is None:
+        chunks.append(("Table of Contents", front_matter))
+        first, last = 1, max((number for number, _ in songs), default=0)
+
+    for number, piece in songs:
+        if first <= number <= last:
+            chunks.append((titles.get(number, f"Song {number}"), piece))
+
+    return chunks
+
+
+def link_chunks(chunks):
+    """Point in-document links at the merged PDF.
+
+    Chunks are printed separately, so a plain href="#song_5" has no target
+    in its own chunk. Each one is rewritten to an INTERNAL_LINK_BASE URL if
+    the anchor is printed in some chunk, or dropped if it is not (songs
+    outside the exported range). Returns the rewritten chunks and the
+    anchor names each chunk defines.
+    """
+    anchors = [ANCHOR_RE.findall(body) for _, body in chunks]
+    exported = {name for names in anchors for name in names}
+
+    def rewrite(match):
+        name = match.group(1)
+        if name in exported:
+            return f'<a href="{INTERNAL_LINK_BASE}{name}">'
+        return "<a>"
+
+    linked = [(title, INTERNAL_HREF_RE.sub(rewrite, body)) for title, body in chunks]
+    return linked, anchors
+
+
+def internal_link_target(annotation):
+    """Anchor name of a link printed from link_chunks, or None"""
+    action = dict.get(annotation, "/A")
+    if isinstance(action, IndirectObject):
+        action = action.get_object()
+    if not isinstance(action, DictionaryObject) or dict.get(action, "/S") != "/URI":
+        return None
+    uri = dict.get(action, "/URI", "")
+    if isinstance(uri, IndirectObject):
+        uri = uri.get_object()
+    if isinstance(uri, bytes):
+        uri = uri.decode("latin-1")
+    if not uri.startswith(INTERNAL_LINK_BASE):
+        return None
+    return uri[len(INTERNAL_LINK_BASE):]
+
+
+async def print_chunks(chunks, work_dir, pool_size=PAGE_POOL_SIZE, fonts_css=""):
+    """Print every chunk to its own PDF file using a pool of browser pages"""
+    queue = asyncio.Queue()
+    paths = []
+    for index, (_, body) in enumerate(chunks):
+        path = work_dir / f"chunk_{index:04d}.pdf"
+        paths.append(path)
+        queue.put_nowait((path, body))
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+
+        async def worker():
+            page = await browser.new_page()
+            while not queue.empty():
+                path, body = queue.get_nowait()
+                content = PRINT_TEMPLATE.format(fonts=fonts_css, family=FONT_FAMILY, body=body)
+                await page.set_content(content, wait_until="load")
+                await page.evaluate("document.fonts.ready")
+                await page.pdf(
+                    path=str(path),
+                    format="A4",
+                    print_background=True,
+                    prefer_css_page_size=True
+                )
+            await page.close()
+
+        workers = min(pool_size, len(chunks))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        await browser.close()
+
+    return paths
+
+
+class StreamingPdfWriter:
+    """Minimal PDF writer that copies pages straight to disk.
+
+    pypdf's PdfWriter keeps every appended page in memory until write(), so
+    memory grows with the document. Here each chunk is read, its pages and
+    everything they reference are renumbered and written out immediately,
+    and the reader is dropped. Only object offsets, page numbers, anchor
+    names and bookmark titles are kept until the page tree, outline and
+    named destinations are written at the end.
+    """
+
+    CATALOG_ID, PAGES_ID, OUTLINES_ID = 1, 2, 3
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.offsets = {}
+        self.next_id = self.OUTLINES_ID + 1
+        self.page_ids = []
+        self.bookmarks = []  # (title, first page id)
+        self.destinations = {}  # anchor name -> page id
+        stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def ref(self, idnum):
+        return IndirectObject(idnum, 0, None)
+
+    def allocate(self):
+        idnum = self.next_id
+        self.next_id += 1
+        return idnum
+
+    def write_object(self, idnum, obj):
+        self.offsets[idnum] = self.stream.tell()
+        self.stream.write(f"{idnum} 0 obj\n".encode())
+        obj.write_to_stream(self.stream)
+        self.stream.write(b"\nendobj\n")
+
+    def append(self, path, title, anchors=()):
+        """Copy every page of the PDF at path and bookmark its first page.
+
+        Each name in anchors becomes a named destination for that page,
+        and links from link_chunks are pointed at those names.
+        """
+        reader = PdfReader(str(path))
+        mapping = {}
+        pending = []
+
+        def remap(obj):
+            if isinstance(obj, IndirectObject):
+                if obj.idnum not in mapping:
+                    mapping[obj.idnum] = self.allocate()
+                    pending.append(obj)
+                return self.ref(mapping[obj.idnum])
+            if isinstance(obj, DictionaryObject):
+                target = internal_link_target(obj)
+                if target is not None:
+                    dict.__delitem__(obj, "/A")
+                    obj[NameObject("/Dest")] = NameObject("/" + target)
+                for key, value in list(obj.items()):
+                    if key == "/Parent":
+                        # Would pull in the chunk's own page tree
+                        dict.__delitem__(obj, key)
+                    else:
+                        dict.__setitem__(obj, key, remap(value))
+            elif isinstance(obj, ArrayObject):
+                for index, value in enumerate(obj):
+                    list.__setitem__(obj, index, remap(value))
+            return obj
+
+        first_page = len(self.page_ids)
+        for page in reader.pages:
+            remap(page.indirect_reference)
+            self.page_ids.append(mapping[page.indirect_reference.idnum])
+        if len(self.page_ids) > first_page:
+            self.bookmarks.append((title, self.page_ids[first_page]))
+            for name in anchors:
+                self.destinations.setdefault(name, self.page_ids[first_page])
+
+        # Objects are renumbered in place and written as soon as they are reached
+        while pending:
+            source = pending.pop()
+            obj = remap(source.get_object())
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page":
+                obj[NameObject("/Parent")] = self.ref(self.PAGES_ID)
+            self.write_object(mapping[source.idnum], obj)
+
+        # Readers hold reference cycles; free this one before the next chunk
+        del reader, pending
+        gc.collect()
+
+    def close(self):
+        """Write the page tree, outline, catalog, xref table and trailer"""
+        self.write_object(self.PAGES_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(self.ref(idnum) for idnum in self.page_ids),
+            NameObject("/Count"): NumberObject(len(self.page_ids)),
+        }))
+
+        item_ids = [self.allocate() for _ in self.bookmarks]
+        for index, (title, page_id) in enumerate(self.bookmarks):
+            item = DictionaryObject({
+                # UTF-16BE with BOM, so Devanagari titles survive
+                NameObject("/Title"): ByteStringObject(codecs.BOM_UTF16_BE + title.encode("utf-16-be")),
+                NameObject("/Parent"): self.ref(self.OUTLINES_ID),
+                NameObject("/Dest"): ArrayObject([self.ref(page_id), NameObject("/Fit")]),
+            })
+            if index > 0:
+                item[NameObject("/Prev")] = self.ref(item_ids[index - 1])
+            if index < len(item_ids) - 1:
+                item[NameObject("/Next")] = self.ref(item_ids[index + 1])
+            self.write_object(item_ids[index], item)
+
+        outlines = DictionaryObject({
+            NameObject("/Type"): NameObject("/Outlines"),
+            NameObject("/Count"): NumberObject(len(item_ids)),
+        })
+        if item_ids:
+            outlines[NameObject("/First")] = self.ref(item_ids[0])
+            outlines[NameObject("/Last")] = self.ref(item_ids[-1])
+        self.write_object(self.OUTLINES_ID, outlines)
+
+        catalog = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): self.ref(self.PAGES_ID),
+            NameObject("/Outlines"): self.ref(self.OUTLINES_ID),
+            NameObject("/PageMode"): NameObject("/UseOutlines"),
+        })
+        if self.destinations:
+            dests_id = self.allocate()
+            self.write_object(dests_id, DictionaryObject({
+                NameObject("/" + name): ArrayObject([self.ref(page_id), NameObject("/Fit")])
+                for name, page_id in self.destinations.items()
+            }))
+            catalog[NameObject("/Dests")] = self.ref(dests_id)
+        self.write_object(self.CATALOG_ID, catalog)
+
+        xref_offset = self.stream.tell()
+        size = self.next_id
+        self.stream.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for idnum in range(1, size):
+            self.stream.write(f"{self.offsets[idnum]:010d} 00000 n \n".encode())
+        self.stream.write(
+            f"trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+
+
+def merge_pdfs(chunk_paths, titles, anchors, pdf_file):
+    """Merge chunk PDFs from disk into one file with a bookmark per chunk"""
+    with open(pdf_file, "wb") as f:
+        writer = StreamingPdfWriter(f)
+        for path, title, names in zip(chunk_paths, titles, anchors):
+            writer.append(path, title, names)
+        writer.close()
+
+
+async def html_to_pdf(html_file, pdf_file, first=None, last=None, pool_size=PAGE_POOL_SIZE):
+    """Convert the HTML file (or a range of its songs) to a print-ready PDF"""
+    try:
+        if not html_file.exists():
+            print(f"[ERROR] HTML file not found: {html_file}")
+            return False
+
+        chunks = select_chunks(html_file.read_text(encoding="utf-8"), first, last)
+        if not chunks:
+            print(f"[ERROR] No songs found in range {first}-{last}")
+            return False
+        chunks, anchors = link_chunks(chunks)
+
+        # Chunk PDFs stay on disk and are merged one at a time, so memory
+        # stays flat as the song count grows
+        with tempfile.TemporaryDirectory() as tmp:
+            fonts_css = embedded_font_css(html_file.parent / FONTS_DIRNAME)
+            paths = await print_chunks(chunks, Path(tmp), pool_size, fonts_css)
+            merge_pdfs(paths, [title for title, _ in chunks], anchors, pdf_file)
+
+        print(f"[OK] Successfully exported {len(chunks)} chunks: {pdf_file}")
+        return True
+
+    except Exception as e:
+        print(f"[ERROR] Error exporting HTML to PDF: {e}")
+        return False
+
+
+def parse_song_range(value):
+    """Parse '5' or '5-12' into an inclusive (first, last) tuple"""
+    match = re.fullmatch(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?", value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid song range: {value!r}")
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    if first < 1 or last < first:
+        raise argparse.ArgumentTypeError(f"invalid song range: {value!r}")
+    return first, last
+
+
+async def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Export song notations to PDF")
+    parser.add_argument("--songs", type=parse_song_range, metavar="N[-M]",
+                        help="export only song N, or songs N to M")
+    parser.add_argument("--output", type=Path, default=PDF_FILE,
+                        help=f"output PDF path (default: {PDF_FILE})")
+    parser.add_argument("--pages", type=int, default=PAGE_POOL_SIZE,
+                        help=f"number of browser pages printing in parallel (default: {PAGE_POOL_SIZE})")
+    args = parser.parse_args()
+
+    print("[INFO] Starting PDF export...")
+
+    # Ensure output directory exists
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+
+    first, last = args.songs if args.songs else (None, None)
+    success = await html_to_pdf(HTML_FILE, args.output, first, last, max(1, args.pages))
+    if not success:
+        print("[ERROR] Failed to export PDF")
+        sys.exit(1)
+
+    print("[OK] PDF export completed successfully!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
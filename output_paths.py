@@ -0,0 +1,12 @@
+"""
+Shared output location for the build scripts
+run_pipeline.py points OUTPUT_DIR at the staging dir of the current build;
+run on their own, the scripts all read and write output/ in the repo.
+"""
+
+import os
+from pathlib import Path
+
+REPO_PATH = Path(__file__).resolve().parent
+OUTPUT_DIR_ENV = "SONGNOTES_OUTPUT_DIR"
+OUTPUT_DIR = Path(os.getenv(OUTPUT_DIR_ENV, REPO_PATH / "output"))
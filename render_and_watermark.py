@@ -3,11 +3,13 @@ import sys
 from pathlib import Path
 from playwright.async_api import async_playwright
 from PIL import Image, ImageDraw, ImageFont
+from output_paths import OUTPUT_DIR
+from subset_fonts import FONTS_DIRNAME, WATERMARK_FONT, embedded_font_css
 
 # File paths
-HTML_FILE = Path("output/song_notations.html")
-PNG_FILE = Path("output/song_notations.png")
-WM_FILE = Path("output/song_notations_wm.png")
+HTML_FILE = OUTPUT_DIR / "song_notations.html"
+PNG_FILE = OUTPUT_DIR / "song_notations.png"
+WM_FILE = OUTPUT_DIR / "song_notations_wm.png"
 
 async def html_to_png(html_file, png_file):
     """Convert HTML file to PNG screenshot"""
@@ -25,7 +27,11 @@ async def html_to_png(html_file, png_file):
             
             # Read and set HTML content
             content = html_file.read_text(encoding="utf-8")
+            fonts_css = embedded_font_css(html_file.parent / FONTS_DIRNAME)
+            if fonts_css:
+                content += f"<style>{fonts_css}</style>"
             await page.set_content(content, wait_until="networkidle")
+            await page.evaluate("document.fonts.ready")
             
             # Take full page screenshot
             await page.screenshot(
@@ -56,9 +62,9 @@ def watermark_image(png_path, wm_path, text="© 2025 Bansuri Notations"):
         txt_layer = Image.new("RGBA", img.size, (255, 255, 255, 0))
         draw = ImageDraw.Draw(txt_layer)
         
-        # Try to load a better font, fallback to default
+        # Try the subset webfont, fallback to default
         try:
-            font = ImageFont.truetype("arial.ttf", 24)
+            font = ImageFont.truetype(str(WATERMARK_FONT), 24)
         except:
             try:
                 font = ImageFont.load_default()
@@ -2,6 +2,8 @@ import os
 import subprocess
 import sys
 from datetime import datetime
+from deploy_site import discard_build, new_staging_dir, publish_build
+from output_paths import OUTPUT_DIR_ENV
 
 def run_step(description, command):
     """Run a subprocess step with logging and error capture."""
@@ -41,10 +43,16 @@ def process_docx_if_available():
 def main():
     print("[INFO] Starting complete Bansuri processing pipeline...")
 
+    # Build into a fresh staging dir; the steps pick it up from the environment
+    staging_dir = new_staging_dir()
+    os.environ[OUTPUT_DIR_ENV] = str(staging_dir)
+    print(f"[INFO] Building into {staging_dir}")
+
     steps = [
         ("Reformat Word document", process_docx_if_available),
         ("Convert DOCX → HTML", lambda: run_step("convert_and_push.py", [sys.executable, "convert_and_push.py"])),
         ("Post-process HTML protection", lambda: run_step("render_and_watermark.py", [sys.executable, "render_and_watermark.py"])),
+        ("Export print-ready PDF", lambda: run_step("export_pdf.py", [sys.executable, "export_pdf.py"])),
     ]
 
     success_all = True
@@ -55,13 +63,22 @@ def main():
             success_all = False
             # Do not exit early; continue to next step
 
+    # Only a complete build replaces the published site
+    if success_all:
+        publish_build(staging_dir)
+    else:
+        discard_build(staging_dir)
+        print("[⚠️] Build incomplete - published site left unchanged.")
+
     print("\n" + "=" * 60)
     if success_all:
         print("[🎉] Pipeline completed successfully at", datetime.now())
     else:
         print("[⚠️] Pipeline finished with some errors at", datetime.now())
     print("=" * 60)
+    return success_all
 
 
 if __name__ == "__main__":
-    main()
+    success = main()
+    sys.exit(0 if success else 1)
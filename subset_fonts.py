@@ -0,0 +1,256 @@
+"""
+Glyph-subset webfonts
+Scans the converted HTML for the characters it actually uses and writes WOFF2
+subsets split by script, plus a fonts.css with unicode-range rules so a page
+only downloads the subsets for the glyphs it shows.
+"""
+
+import argparse
+import base64
+import hashlib
+import html
+import json
+import re
+import string
+import sys
+import urllib.request
+from pathlib import Path
+from fontTools import subset
+
+# Configuration
+REPO_PATH = Path(__file__).resolve().parent
+SOURCE_DIR = REPO_PATH / "fonts" / "source"  # downloaded fonts, git-ignored
+FONTS_LOCK = REPO_PATH / "fonts" / "fonts.lock.json"  # pinned commit + SHA-256 per file
+FONTS_DIRNAME = "fonts"  # written next to the HTML file
+FONTS_CSS = "fonts.css"
+FONT_FAMILY = "Bansuri Serif"
+NOTO_URL = "https://raw.githubusercontent.com/notofonts/notofonts.github.io/{ref}/fonts/{family}/hinted/ttf/{file}"
+
+# (script, weight) -> (Noto family, file name)
+SOURCE_FONTS = {
+    ("latin", 400): ("NotoSerif", "NotoSerif-Regular.ttf"),
+    ("latin", 700): ("NotoSerif", "NotoSerif-Bold.ttf"),
+    ("devanagari", 400): ("NotoSerifDevanagari", "NotoSerifDevanagari-Regular.ttf"),
+    ("devanagari", 700): ("NotoSerifDevanagari", "NotoSerifDevanagari-Bold.ttf"),
+}
+
+# Code points served by the Devanagari subset; everything else goes to Latin.
+# ZWJ/ZWNJ are included because they control conjunct shaping.
+DEVANAGARI_RANGES = [(0x0900, 0x097F), (0x1CD0, 0x1CFF), (0xA8E0, 0xA8FF), (0x200C, 0x200D)]
+
+# Always kept in the Latin subset so the watermark and link text render
+# whatever the song content happens to use
+ALWAYS_INCLUDE = string.printable.strip() + " ©"
+
+# The Latin regular subset is also written as TTF for Pillow's watermark.
+# It is only needed at build time, so it stays out of the published fonts dir.
+WATERMARK_FONT = SOURCE_DIR / "watermark-latin-400.ttf"
+
+TAG_RE = re.compile(r"<[^>]+>")
+SCRIPT_RE = re.compile(r"<(script|style)\b.*?</\1>", re.S)
+URL_RE = re.compile(r'url\("([^"]+\.woff2)"\)')
+
+
+def extract_text(content):
+    """Return the visible text of an HTML fragment"""
+    content = SCRIPT_RE.sub("", content)
+    return html.unescape(TAG_RE.sub("", content))
+
+
+def script_of(codepoint):
+    """Name of the subset a code point belongs to"""
+    for start, end in DEVANAGARI_RANGES:
+        if start <= codepoint <= end:
+            return "devanagari"
+    return "latin"
+
+
+def codepoints_by_script(text):
+    """Group the printable code points of text by script"""
+    groups = {}
+    for char in set(text + ALWAYS_INCLUDE):
+        codepoint = ord(char)
+        if codepoint < 0x20:
+            continue
+        groups.setdefault(script_of(codepoint), set()).add(codepoint)
+    return groups
+
+
+def format_unicode_range(codepoints):
+    """Format code points as a compact CSS unicode-range value"""
+    ranges = []
+    for codepoint in sorted(codepoints):
+        if ranges and ranges[-1][1] == codepoint - 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+    return ", ".join(
+        f"U+{start:X}" if start == end else f"U+{start:X}-{end:X}"
+        for start, end in ranges
+    )
+
+
+def file_sha256(path):
+    """SHA-256 of a file"""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def fonts_pinned(lock_path=FONTS_LOCK):
+    """Whether the source fonts have been pinned with --lock"""
+    return lock_path.exists()
+
+
+def read_lock(lock_path=FONTS_LOCK):
+    """Load the pinned source font commit and checksums"""
+    if not lock_path.exists():
+        raise RuntimeError(
+            f"{lock_path} not found. Pin the source fonts with: "
+            "python subset_fonts.py --lock <notofonts.github.io commit>"
+        )
+    with open(lock_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def download(url, path):
+    """Download url to path via a temporary file"""
+    tmp_path = path.with_name(path.name + ".part")
+    try:
+        urllib.request.urlretrieve(url, tmp_path)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        raise RuntimeError(f"Could not download {url}: {e}") from e
+    tmp_path.replace(path)
+
+
+def fetch_source_fonts(source_dir=SOURCE_DIR, lock_path=FONTS_LOCK):
+    """Download missing source fonts from the pinned commit and verify them.
+
+    Raises RuntimeError if a font cannot be downloaded or its SHA-256 does
+    not match the lock, so a build never silently falls back to system fonts.
+    """
+    lock = read_lock(lock_path)
+    source_dir.mkdir(parents=True, exist_ok=True)
+    for family, file_name in SOURCE_FONTS.values():
+        expected = lock["files"].get(file_name)
+        if not expected:
+            raise RuntimeError(f"{file_name} missing from {lock_path}")
+
+        path = source_dir / file_name
+        if path.exists() and file_sha256(path) == expected:
+            continue
+
+        print(f"[INFO] Downloading {file_name}...")
+        download(NOTO_URL.format(ref=lock["ref"], family=family, file=file_name), path)
+        actual = file_sha256(path)
+        if actual != expected:
+            path.unlink()
+            raise RuntimeError(f"{file_name} checksum mismatch: expected {expected}, got {actual}")
+
+
+def lock_source_fonts(ref, source_dir=SOURCE_DIR, lock_path=FONTS_LOCK):
+    """Download the source fonts at a notofonts.github.io commit and pin their hashes"""
+    if not re.fullmatch(r"[0-9a-f]{40}", ref):
+        raise ValueError(f"expected a full 40-character commit hash, got {ref!r}")
+
+    source_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for family, file_name in SOURCE_FONTS.values():
+        path = source_dir / file_name
+        print(f"[INFO] Downloading {file_name}...")
+        download(NOTO_URL.format(ref=ref, family=family, file=file_name), path)
+        files[file_name] = file_sha256(path)
+
+    with open(lock_path, "w", encoding="utf-8") as f:
+        json.dump({"ref": ref, "files": files}, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"[OK] Pinned {len(files)} source fonts at {ref} in {lock_path}")
+
+
+def subset_font(source_path, output_path, codepoints, flavor="woff2"):
+    """Write a subset of source_path holding only the given code points"""
+    options = subset.Options()
+    options.flavor = flavor
+    options.layout_features = ["*"]  # keep Devanagari conjuncts and matras
+    font = subset.load_font(str(source_path), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    subset.save_font(font, str(output_path), options)
+    font.close()
+
+
+def font_face_rule(file_name, weight, unicode_range):
+    """CSS @font-face rule for one subset file"""
+    return (
+        "@font-face {\n"
+        f'  font-family: "{FONT_FAMILY}";\n'
+        "  font-style: normal;\n"
+        f"  font-weight: {weight};\n"
+        "  font-display: swap;\n"
+        f'  src: url("{file_name}") format("woff2");\n'
+        f"  unicode-range: {unicode_range};\n"
+        "}\n"
+    )
+
+
+def build_webfonts(content, fonts_dir, source_dir=SOURCE_DIR, lock_path=FONTS_LOCK):
+    """Subset the source fonts to the glyphs used in content.
+
+    Writes one WOFF2 file per script and weight into fonts_dir together with
+    fonts.css, and the watermark TTF into the source dir. Raises
+    RuntimeError if the pinned source fonts cannot be fetched.
+    """
+    fetch_source_fonts(source_dir, lock_path)
+
+    fonts_dir = Path(fonts_dir)
+    fonts_dir.mkdir(parents=True, exist_ok=True)
+    for stale in fonts_dir.glob("*.woff2"):
+        stale.unlink()
+
+    groups = codepoints_by_script(extract_text(content))
+    rules = []
+    for (script, weight), (_, file_name) in SOURCE_FONTS.items():
+        codepoints = groups.get(script)
+        if not codepoints:
+            continue
+        output_name = f"{script}-{weight}.woff2"
+        subset_font(source_dir / file_name, fonts_dir / output_name, codepoints)
+        rules.append(font_face_rule(output_name, weight, format_unicode_range(codepoints)))
+        print(f"[OK] Subset {file_name}: {len(codepoints)} characters -> {output_name}")
+
+    subset_font(source_dir / SOURCE_FONTS[("latin", 400)][1],
+                source_dir / WATERMARK_FONT.name, groups["latin"], flavor=None)
+
+    rules.append(f'body {{ font-family: "{FONT_FAMILY}", Georgia, serif; }}\n')
+    (fonts_dir / FONTS_CSS).write_text("\n".join(rules), encoding="utf-8")
+    return True
+
+
+def embedded_font_css(fonts_dir):
+    """fonts.css with each font inlined as a data URI.
+
+    Used for Playwright rendering, where the HTML is loaded with set_content
+    and relative font URLs cannot be resolved. Returns "" if no fonts were built.
+    """
+    fonts_dir = Path(fonts_dir)
+    css_path = fonts_dir / FONTS_CSS
+    if not css_path.exists():
+        return ""
+
+    def inline(match):
+        data = base64.b64encode((fonts_dir / match.group(1)).read_bytes()).decode("ascii")
+        return f'url("data:font/woff2;base64,{data}")'
+
+    return URL_RE.sub(inline, css_path.read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pin the Noto source fonts used for subsetting")
+    parser.add_argument("--lock", metavar="COMMIT", required=True,
+                        help="notofonts.github.io commit to download the fonts from")
+    args = parser.parse_args()
+    try:
+        lock_source_fonts(args.lock)
+    except (RuntimeError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
@@ -0,0 +1,106 @@
+"""Deploy a staged site to a local bare repo and check what gets pushed"""
+
+import subprocess
+
+import pytest
+
+from deploy_site import MANIFEST_NAME, deploy, git, publish_build
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch):
+    for role in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{role}_NAME", "Deploy Test")
+        monkeypatch.setenv(f"GIT_{role}_EMAIL", "deploy@example.com")
+
+
+@pytest.fixture
+def remote(tmp_path):
+    path = tmp_path / "remote.git"
+    subprocess.run(["git", "init", "-q", "--bare", str(path)], check=True)
+    return path
+
+
+def make_build(tmp_path, name, files):
+    staging_dir = tmp_path / "builds" / name
+    for rel, content in files.items():
+        path = staging_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    return staging_dir
+
+
+def publish(tmp_path, name, files):
+    staging_dir = make_build(tmp_path, name, files)
+    site_link = tmp_path / "site"
+    publish_build(staging_dir, site_link)
+    return site_link
+
+
+def tree_files(remote, branch="gh-pages"):
+    return set(git(remote, "ls-tree", "-r", "--name-only", branch).splitlines())
+
+
+def object_ids(remote):
+    listing = git(remote, "cat-file", "--batch-all-objects", "--batch-check")
+    return {line.split()[0]: line.split()[1] for line in listing.splitlines()}
+
+
+def blob_id(remote, path, branch="gh-pages"):
+    return git(remote, "rev-parse", f"{branch}:{path}")
+
+
+SITE = {
+    "song_notations.html": "<p>songs</p>\n",
+    "song_notations.pdf": "%PDF-1.7\n",
+    "fonts/latin-400.woff2": "latin\n",
+}
+
+
+def test_first_deploy(tmp_path, remote):
+    site = publish(tmp_path, "1", SITE)
+    deploy(site, str(remote), repo_dir=tmp_path / "deploy.git")
+
+    assert tree_files(remote) == set(SITE) | {MANIFEST_NAME, ".nojekyll"}
+
+
+def test_delta_deploy_pushes_only_changed_blobs(tmp_path, remote):
+    repo_dir = tmp_path / "deploy.git"
+    deploy(publish(tmp_path, "1", SITE), str(remote), repo_dir=repo_dir)
+    before = object_ids(remote)
+
+    site = dict(SITE, **{"song_notations.html": "<p>more songs</p>\n"})
+    del site["song_notations.pdf"]
+    deploy(publish(tmp_path, "2", site), str(remote), repo_dir=repo_dir)
+
+    assert tree_files(remote) == set(site) | {MANIFEST_NAME, ".nojekyll"}
+    new_blobs = {oid for oid, kind in object_ids(remote).items()
+                 if kind == "blob" and oid not in before}
+    assert new_blobs == {blob_id(remote, "song_notations.html"), blob_id(remote, MANIFEST_NAME)}
+
+
+def test_unchanged_deploy_is_a_no_op(tmp_path, remote):
+    repo_dir = tmp_path / "deploy.git"
+    deploy(publish(tmp_path, "1", SITE), str(remote), repo_dir=repo_dir)
+    tip = git(remote, "rev-parse", "gh-pages")
+
+    deploy(publish(tmp_path, "2", SITE), str(remote), repo_dir=repo_dir)
+
+    assert git(remote, "rev-parse", "gh-pages") == tip
+
+
+def test_branch_without_manifest_is_replaced(tmp_path, remote):
+    # gh-pages as published before manifests: the whole repo plus a CNAME
+    work = tmp_path / "work"
+    subprocess.run(["git", "init", "-q", "-b", "gh-pages", str(work)], check=True)
+    for name in ("README.md", "reformat.py", "CNAME", "song_notations.html"):
+        (work / name).write_text(f"old {name}\n", encoding="utf-8")
+    git(work, "add", ".")
+    git(work, "commit", "-q", "-m", "old publish")
+    git(work, "push", "-q", str(remote), "gh-pages")
+
+    deploy(publish(tmp_path, "1", SITE), str(remote), repo_dir=tmp_path / "deploy.git")
+
+    assert tree_files(remote) == set(SITE) | {MANIFEST_NAME, ".nojekyll", "CNAME"}
+    assert git(remote, "show", "gh-pages:CNAME") == "old CNAME"
+    assert git(remote, "show", "gh-pages:song_notations.html") == "<p>songs</p>"